@@ -8,7 +8,7 @@ from Backend.Source.Services.KnowledgeBaseService import get_kb_service
 from Backend.Source.Services.ChatHistoryService import chat_history_service
 import json
 import re
-from Backend.Source.Services.SettingsService import settings_service
+from Backend.Source.Services.SettingsService import get_settings_service
 from Backend.Source.Api.Routes.Auth import get_current_user
 from Backend.Source.Models.User import User
 from Backend.Source.Core.Config.Config import settings
@@ -197,7 +197,7 @@ async def chat_endpoint(
 
     final_context = "\n\n".join(context_parts) if context_parts else "No context available."
     
-    system_prompt = settings_service.get_settings().system_prompt
+    system_prompt = get_settings_service().get_settings().system_prompt
     try:
         system_prompt = system_prompt.format(context_text=final_context, user_query=user_query)
     except (KeyError, ValueError) as e:
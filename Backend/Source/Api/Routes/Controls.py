@@ -1,6 +1,7 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
 from pathlib import Path
 import os
+import shutil
 from Backend.Source.Services.IngestionService import ingestion_service
 from Backend.Source.Core.Config.Config import settings
 from Backend.Source.Core.Logging import logger
@@ -48,14 +49,18 @@ async def upload_control(
     Requires authentication. Rate limited.
     """
     try:
-        # Read file content
-        file_content = await file.read()
+        # Measure the spooled upload and read only its header
+        file.file.seek(0, os.SEEK_END)
+        upload_size = file.file.tell()
+        await file.seek(0)
+        header = await file.read(FileValidator.MIME_SNIFF_BYTES)
 
-        # Validate file (size, type, sanitize name)
+        # Validate file (size, type, sanitize name) without loading the body
         safe_filename, file_size = await FileValidator.validate_upload(
-            file_content,
+            header,
             file.filename,
-            max_size=settings.MAX_FILE_SIZE_GENERAL
+            max_size=settings.MAX_FILE_SIZE_GENERAL,
+            file_size=upload_size
         )
 
         # Construct safe path
@@ -66,9 +71,10 @@ async def upload_control(
             logger.warning(f"Attempted to upload duplicate file: {safe_filename}", extra={"user_id": current_user.id})
             raise ValidationError(f"File {safe_filename} already exists")
 
-        # Save to disk
+        # Save to disk, streaming from the spooled upload
+        await file.seek(0)
         with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
+            shutil.copyfileobj(file.file, buffer)
 
         logger.info(f"File uploaded: {safe_filename} ({file_size} bytes)", extra={"user_id": current_user.id})
 
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from Backend.Source.Services.ChatHistoryService import chat_history_service
 from Backend.Source.Api.Routes.Auth import get_current_user
 from Backend.Source.Models.User import User
@@ -15,8 +15,7 @@ class ConversationResponse(BaseModel):
     title: str
     created_at: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class MessageResponse(BaseModel):
     id: int
@@ -25,8 +24,7 @@ class MessageResponse(BaseModel):
     attachment_name: Optional[str] = None
     created_at: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class CreateConversationRequest(BaseModel):
     title: str = Field(default="New Chat", max_length=500, min_length=1)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
-from Backend.Source.Services.SettingsService import settings_service, SettingsModel
+from Backend.Source.Services.SettingsService import get_settings_service, SettingsModel
 from Backend.Source.Api.Routes.Auth import get_current_user
 from Backend.Source.Models.User import User
 from Backend.Source.Utils.CSRF import verify_csrf
@@ -48,7 +48,7 @@ async def get_settings(current_user: User = Depends(get_current_user)):
     Get the current application settings.
     Requires authentication.
     """
-    return settings_service.get_settings()
+    return get_settings_service().get_settings()
 
 
 @router.post("/settings", response_model=SettingsModel)
@@ -66,7 +66,7 @@ async def update_settings(
         validated_prompt = validate_system_prompt(settings_data.system_prompt)
         settings_data.system_prompt = validated_prompt
 
-        settings_service.save_settings(settings_data)
+        get_settings_service().save_settings(settings_data)
         logger.info(f"Settings updated by user {current_user.username}")
         return settings_data
     except HTTPException:
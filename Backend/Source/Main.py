@@ -30,14 +30,7 @@ try:
 finally:
     db.close()
 
-app = FastAPI(
-    title="QiyasAI Copilot",
-    description="Backend for QiyasAI Copilot using Azure OpenAI",
-    version="1.0.0"
-)
 
-
-@app.on_event("startup")
 async def startup_event():
     """Auto-ingest existing files from Data/Raw folder on startup (background task)"""
     logger.info("Function startup_event called")
@@ -50,26 +43,8 @@ async def run_auto_ingest():
     await IngestionService.auto_ingest_existing_files()
     logger.info("Auto-ingestion background task complete")
 
-# Add rate limiter state
-app.state.limiter = limiter
-
-# Register rate limit exception handler
-app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
-
-# CORS Middleware
-cors_origins = [origin.strip() for origin in settings.CORS_ORIGINS.split(',')]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=cors_origins,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "X-CSRF-Token", "X-Request-ID"],
-    expose_headers=["X-Request-ID"]
-)
-
 
 # Request Logging Middleware
-@app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Log all HTTP requests with timing and metadata"""
     request_id = str(uuid.uuid4())
@@ -113,7 +88,6 @@ async def log_requests(request: Request, call_next):
 
 
 # Global Exception Handler
-@app.exception_handler(QiyasAIException)
 async def qiyasai_exception_handler(request: Request, exc: QiyasAIException):
     """Handle custom QiyasAI exceptions"""
     logger.error(
@@ -135,7 +109,6 @@ async def qiyasai_exception_handler(request: Request, exc: QiyasAIException):
     )
 
 
-@app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle FastAPI validation errors (422) and log details"""
     error_details = []
@@ -165,7 +138,6 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
-@app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle unexpected exceptions"""
     logger.exception(
@@ -186,15 +158,6 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 
-# Include Routers (Rate limits applied in route files)
-app.include_router(Auth.router, prefix="/api/auth", tags=["Auth"])
-app.include_router(Chat.router, prefix="/api", tags=["Chat"])
-app.include_router(Controls.router, prefix="/api/controls", tags=["Controls"])
-app.include_router(History.router)
-app.include_router(Settings.router, prefix="/api")
-
-
-@app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
@@ -204,6 +167,69 @@ async def health_check():
     }
 
 
+# Routers by name, with their include_router arguments (rate limits applied in route files)
+ROUTERS = {
+    "auth": (Auth.router, {"prefix": "/api/auth", "tags": ["Auth"]}),
+    "chat": (Chat.router, {"prefix": "/api", "tags": ["Chat"]}),
+    "controls": (Controls.router, {"prefix": "/api/controls", "tags": ["Controls"]}),
+    "history": (History.router, {}),
+    "settings": (Settings.router, {"prefix": "/api"}),
+}
+
+
+def create_app(routers=None) -> FastAPI:
+    """
+    Build the FastAPI application.
+
+    Args:
+        routers: Names from ROUTERS to mount (default: all of them)
+
+    Returns:
+        Configured FastAPI application
+    """
+    app = FastAPI(
+        title="QiyasAI Copilot",
+        description="Backend for QiyasAI Copilot using Azure OpenAI",
+        version="1.0.0"
+    )
+
+    app.on_event("startup")(startup_event)
+
+    # Add rate limiter state
+    app.state.limiter = limiter
+
+    # Register rate limit exception handler
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
+
+    # CORS Middleware
+    cors_origins = [origin.strip() for origin in settings.CORS_ORIGINS.split(',')]
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=cors_origins,
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["Content-Type", "Authorization", "X-CSRF-Token", "X-Request-ID"],
+        expose_headers=["X-Request-ID"]
+    )
+    app.middleware("http")(log_requests)
+
+    # Global Exception Handlers
+    app.add_exception_handler(QiyasAIException, qiyasai_exception_handler)
+    app.add_exception_handler(RequestValidationError, validation_exception_handler)
+    app.add_exception_handler(Exception, general_exception_handler)
+
+    for name in (ROUTERS if routers is None else routers):
+        router, options = ROUTERS[name]
+        app.include_router(router, **options)
+
+    app.get("/health")(health_check)
+
+    return app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     import uvicorn
     logger.info(f"Starting QiyasAI Backend on {settings.HOST}:{settings.PORT}")
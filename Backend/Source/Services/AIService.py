@@ -2,7 +2,8 @@ from openai import AzureOpenAI, AsyncAzureOpenAI
 from openai.types.chat import ChatCompletion
 from Backend.Source.Core.Config.Config import settings
 from Backend.Source.Core.Logging import logger
-from typing import Dict, List, Optional, Any, Union
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Any, Union
 import re
 import json
 import numpy as np
@@ -114,6 +115,21 @@ class AzureOpenAIService:
         self._standard_embeddings = None
         self._embeddings_initialized = False
 
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator["AzureOpenAIService"]:
+        """
+        Scope a batch of calls (e.g. a script run) to this service's clients.
+
+        Both OpenAI clients keep a pooled HTTP connection for the life of
+        the service, so every call inside the block reuses the same
+        connections; they are closed when the block exits.
+        """
+        try:
+            yield self
+        finally:
+            await self.client.close()
+            self.sync_client.close()
+
     def _get_standard_embeddings(self) -> Dict[str, List[float]]:
         """Get or compute embeddings for all standards (cached, lazy initialization)."""
         if not self._embeddings_initialized:
@@ -1,11 +1,9 @@
 
-import json
 import os
-import tempfile
-import shutil
+import secrets
+from functools import cache
 from pathlib import Path
-from pydantic import BaseModel, Field
-from threading import Lock
+from pydantic import BaseModel, ConfigDict, Field
 from Backend.Source.Core.Logging import logger
 
 # Constants
@@ -17,6 +15,8 @@ class SettingsModel(BaseModel):
     Pydantic model for application settings.
     Defines the schema and validation rules.
     """
+    model_config = ConfigDict(cache_strings="all")
+
     system_prompt: str = Field(
         default="""أنت مساعد امتثال/تفسير رسمي لمعايير هيئة الحكومة الرقمية (DGA) من وثيقة:
 "المعايير الأساسية للتحول الرقمي" إصدار 4.0 (مارس 2025).
@@ -56,9 +56,6 @@ class SettingsModel(BaseModel):
     )
 
 class SettingsService:
-    _instance = None
-    _lock = Lock()
-    
     def __init__(self):
         self._settings = None
         # Ensure Data directory exists
@@ -67,14 +64,6 @@ class SettingsService:
             
         self._load_settings()
 
-    @classmethod
-    def get_instance(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = cls()
-        return cls._instance
-
     def _load_settings(self):
         """Loads settings from disk or creates default if missing."""
         if not SETTINGS_FILE.exists():
@@ -83,9 +72,8 @@ class SettingsService:
             self.save_settings(self._settings)
         else:
             try:
-                with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self._settings = SettingsModel(**data)
+                # Parse and validate in one pass through pydantic-core's JSON parser
+                self._settings = SettingsModel.model_validate_json(SETTINGS_FILE.read_bytes())
             except Exception as e:
                 logger.warning(f"Error loading settings: {e}. Reverting to defaults.")
                 self._settings = SettingsModel()
@@ -103,21 +91,26 @@ class SettingsService:
         self._settings = new_settings
         
         # Atomic Write Strategy
+        # Temporary file lives next to the target so os.replace stays on one filesystem
+        temp_path = SETTINGS_FILE.with_suffix(f".json.tmp.{secrets.token_hex(4)}")
         try:
-            # Create a temporary file in the same directory
-            with tempfile.NamedTemporaryFile('w', dir=DATA_DIR, delete=False, encoding='utf-8') as tmp_file:
-                json.dump(new_settings.model_dump(), tmp_file, ensure_ascii=False, indent=4)
-                temp_path = tmp_file.name
-            
-            # Atomic move (replace)
-            shutil.move(temp_path, SETTINGS_FILE)
+            with open(temp_path, 'wb') as tmp_file:
+                tmp_file.write(new_settings.model_dump_json(indent=4).encode('utf-8'))
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+
+            # Atomic rename (replace)
+            os.replace(temp_path, SETTINGS_FILE)
             logger.info("Settings saved successfully")
 
         except Exception as e:
             logger.error(f"Failed to save settings: {e}", exc_info=True)
-            if 'temp_path' in locals() and os.path.exists(temp_path):
+            if temp_path.exists():
                 os.remove(temp_path)
             raise e
 
-# Global Accessor
-settings_service = SettingsService.get_instance()
+
+@cache
+def get_settings_service() -> SettingsService:
+    """Returns the shared SettingsService, loading settings from disk on first use."""
+    return SettingsService()
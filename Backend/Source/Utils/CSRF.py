@@ -1,19 +1,137 @@
+import heapq
 import secrets
-from datetime import datetime, timedelta, timezone
+import time
+from collections.abc import Iterator, MutableMapping
+from hashlib import blake2b
+from threading import Lock
 from typing import Optional
 from fastapi import Request, HTTPException, status
 from Backend.Source.Core.Logging import logger
 
+CSRF_TOKEN_EXPIRY = 3600.0  # seconds (1 hour)
+CSRF_MAX_TOKENS = 100_000  # cap on live tokens held in memory
+CSRF_SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ShardedTokenStore(MutableMapping):
+    """
+    Dict-like token store split into lock-guarded shards.
+
+    Concurrent requests only contend on the shard holding their token, and
+    growth resizes one small dict instead of the whole store. Each shard
+    keeps a min-heap of (expiry, key) under its own lock, so remove_expired
+    touches only the entries that expired. With max_size set, a full shard
+    evicts its oldest entry on insert.
+    """
+
+    # Stale heap entries allowed beyond twice the shard's size before a rebuild
+    _HEAP_SLACK = 32
+
+    def __init__(self, shard_count: int = 16, max_size: Optional[int] = None):
+        if shard_count & (shard_count - 1):
+            raise ValueError("shard_count must be a power of two")
+        self._mask = shard_count - 1
+        self._shard_capacity = None if max_size is None else max(1, max_size // shard_count)
+        # (entries, expiry heap, lock) per shard. Expiries mostly arrive in
+        # increasing order, so pushes rarely sift
+        self._shards: list[tuple[dict[bytes, float], list[tuple[float, bytes]], Lock]] = [
+            ({}, [], Lock()) for _ in range(shard_count)
+        ]
+
+    def _shard(self, key: bytes) -> tuple[dict[bytes, float], list[tuple[float, bytes]], Lock]:
+        # Keys are uniformly distributed digests, so the first byte is enough
+        return self._shards[key[0] & self._mask]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, bytes) and key in self._shard(key)[0]
+
+    def __getitem__(self, key: bytes) -> float:
+        return self._shard(key)[0][key]
+
+    def __setitem__(self, key: bytes, expiry: float) -> None:
+        shard, heap, lock = self._shard(key)
+        with lock:
+            if (
+                self._shard_capacity is not None
+                and len(shard) >= self._shard_capacity
+                and key not in shard
+            ):
+                # Tokens are inserted in expiry order, so the first key is the oldest
+                del shard[next(iter(shard))]
+            shard[key] = expiry
+            heapq.heappush(heap, (expiry, key))
+            if len(heap) > 2 * len(shard) + self._HEAP_SLACK:
+                # Evicted, popped and re-set keys leave stale entries behind;
+                # keep only the live ones so the heap stays bounded by the shard
+                heap[:] = [(exp, k) for exp, k in heap if shard.get(k) == exp]
+                heapq.heapify(heap)
+
+    def __delitem__(self, key: bytes) -> None:
+        shard, _, lock = self._shard(key)
+        with lock:
+            del shard[key]
+
+    def __iter__(self) -> Iterator[bytes]:
+        for shard, _, lock in self._shards:
+            with lock:
+                keys = list(shard)
+            yield from keys
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard, _, _ in self._shards)
+
+    def get(self, key: bytes, default: Optional[float] = None) -> Optional[float]:
+        return self._shard(key)[0].get(key, default)
+
+    def pop(self, key: bytes, *default):
+        shard, _, lock = self._shard(key)
+        with lock:
+            return shard.pop(key, *default)
+
+    def clear(self) -> None:
+        for shard, heap, lock in self._shards:
+            with lock:
+                shard.clear()
+                heap.clear()
+
+    def remove_expired(self, now: float) -> int:
+        """Drop entries whose expiry is before now; returns how many were removed"""
+        total_removed = 0
+        for shard, heap, lock in self._shards:
+            removed = 0
+            with lock:
+                while heap and heap[0][0] < now:
+                    expiry, key = heapq.heappop(heap)
+                    # Skip heap entries for keys since deleted or re-set
+                    if shard.get(key) == expiry:
+                        del shard[key]
+                        removed += 1
+
+                if removed * 2 > removed + len(shard):
+                    # Mostly expired: refill from the survivors in one step so
+                    # the table shrinks too (dicts never shrink on del)
+                    survivors = dict(shard)
+                    shard.clear()
+                    shard.update(survivors)
+            total_removed += removed
+        return total_removed
+
+
 # In-memory store for CSRF tokens (use Redis in production)
-csrf_tokens: dict[str, datetime] = {}
+# Maps csrf_token_key(token) -> expiry as a time.monotonic() timestamp.
+# Only digests are stored, so a leaked store does not expose usable tokens.
+csrf_tokens = ShardedTokenStore(max_size=CSRF_MAX_TOKENS)
+
 
-CSRF_TOKEN_EXPIRY = timedelta(hours=1)
+def csrf_token_key(token: str) -> bytes:
+    """Return the fixed-size store key for a CSRF token"""
+    return blake2b(token.encode(), digest_size=16).digest()
 
 
 def generate_csrf_token() -> str:
     """Generate a cryptographically secure CSRF token"""
     token = secrets.token_urlsafe(32)
-    csrf_tokens[token] = datetime.now(timezone.utc) + CSRF_TOKEN_EXPIRY
+    csrf_tokens[csrf_token_key(token)] = time.monotonic() + CSRF_TOKEN_EXPIRY
     return token
 
 
@@ -31,13 +149,14 @@ def validate_csrf_token(token: Optional[str]) -> bool:
         return False
 
     # Check if token exists and not expired
-    expiry = csrf_tokens.get(token)
-    if not expiry:
+    key = csrf_token_key(token)
+    expiry = csrf_tokens.get(key)
+    if expiry is None:
         return False
 
-    if datetime.now(timezone.utc) > expiry:
+    if time.monotonic() > expiry:
         # Token expired, remove it
-        del csrf_tokens[token]
+        csrf_tokens.pop(key, None)
         return False
 
     return True
@@ -45,10 +164,7 @@ def validate_csrf_token(token: Optional[str]) -> bool:
 
 def cleanup_expired_tokens():
     """Remove expired CSRF tokens from store"""
-    now = datetime.now(timezone.utc)
-    expired = [token for token, expiry in csrf_tokens.items() if now > expiry]
-    for token in expired:
-        del csrf_tokens[token]
+    csrf_tokens.remove_expired(time.monotonic())
 
 
 async def verify_csrf(request: Request) -> None:
@@ -59,7 +175,7 @@ async def verify_csrf(request: Request) -> None:
         HTTPException: If CSRF token invalid or missing
     """
     # Skip CSRF for GET, HEAD, OPTIONS
-    if request.method in ["GET", "HEAD", "OPTIONS"]:
+    if request.method in CSRF_SAFE_METHODS:
         return
 
     # Get CSRF token from header
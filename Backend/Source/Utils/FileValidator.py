@@ -1,11 +1,36 @@
 import magic
 import os
-from pathlib import Path
+import re
 from typing import Tuple
 from Backend.Source.Core.Config.Config import settings
 from Backend.Source.Core.Exceptions import ValidationError
 from Backend.Source.Core.Logging import logger
 
+# Single-character bans stripped in one translate() pass
+_SANITIZE_TABLE = str.maketrans({"/": "", "\\": "", "\x00": ""})
+
+# Dot runs, collapsed to a single dot after the table so removed separators
+# cannot rejoin dots into a new ".." (and "a...pdf" keeps its extension)
+_SANITIZE_RE = re.compile(r"\.{2,}")
+
+# Extension whitelist parsed from settings once, instead of on every upload
+_ALLOWED_EXTENSIONS = frozenset(ext.lower() for ext in settings.allowed_extensions_list)
+
+# Content types each extension may actually contain; validate_upload checks
+# the detected MIME type against this so e.g. a PNG cannot be saved as .pdf.
+# Extensions configured but not listed here accept any whitelisted type.
+_EXT_TO_MIME = {
+    '.pdf': frozenset({'application/pdf'}),
+    '.docx': frozenset({'application/vnd.openxmlformats-officedocument.wordprocessingml.document'}),
+    '.doc': frozenset({'application/msword'}),
+    '.xlsx': frozenset({'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'}),
+    '.xls': frozenset({'application/vnd.ms-excel'}),
+    '.txt': frozenset({'text/plain'}),
+    '.png': frozenset({'image/png'}),
+    '.jpg': frozenset({'image/jpeg'}),
+    '.jpeg': frozenset({'image/jpeg'}),
+}
+
 
 class FileValidator:
     """Validates uploaded files for security and compliance"""
@@ -22,6 +47,16 @@ class FileValidator:
         'image/jpeg',
     }
 
+    # libmagic only needs the file header to classify the formats above
+    MIME_SNIFF_BYTES = 8192
+
+    # Unambiguous magic-byte prefixes resolved without calling libmagic
+    KNOWN_SIGNATURES = (
+        (b'%PDF', 'application/pdf'),
+        (b'\x89PNG\r\n\x1a\n', 'image/png'),
+        (b'\xff\xd8\xff', 'image/jpeg'),
+    )
+
     @staticmethod
     def sanitize_filename(filename: str) -> str:
         """
@@ -33,21 +68,33 @@ class FileValidator:
         Returns:
             Sanitized filename (only basename, no path components)
         """
-        # Get only the filename, removing any path components
-        safe_name = os.path.basename(filename)
+        # Get only the filename, then strip separators, null bytes and
+        # any remaining path traversal attempts
+        safe_name = _SANITIZE_RE.sub(".", os.path.basename(filename).translate(_SANITIZE_TABLE))
 
-        # Remove any remaining path traversal attempts
-        safe_name = safe_name.replace("..", "").replace("/", "").replace("\\", "")
-
-        # Remove null bytes
-        safe_name = safe_name.replace("\x00", "")
-
-        if not safe_name:
+        # A name of only dots ("..", "x/..", "..\\..") collapses to "." and
+        # would point at the directory itself
+        if not safe_name.strip("."):
             raise ValidationError("Invalid filename")
 
         logger.debug(f"Sanitized filename: {filename} -> {safe_name}")
         return safe_name
 
+    @staticmethod
+    def _check_extension(filename: str) -> str:
+        """Return the lowercased extension of filename, raising if not whitelisted."""
+        stem, _, ext = filename.rpartition('.')
+        file_ext = f".{ext.lower()}" if stem else ""
+
+        if file_ext not in _ALLOWED_EXTENSIONS:
+            logger.warning(f"Rejected file with invalid extension: {file_ext}")
+            raise ValidationError(
+                f"File type not allowed. Allowed types: {settings.ALLOWED_FILE_EXTENSIONS}",
+                details={"filename": filename, "extension": file_ext}
+            )
+
+        return file_ext
+
     @staticmethod
     def validate_file_extension(filename: str) -> bool:
         """
@@ -62,15 +109,7 @@ class FileValidator:
         Raises:
             ValidationError: If extension not allowed
         """
-        file_ext = Path(filename).suffix.lower()
-
-        if file_ext not in settings.allowed_extensions_list:
-            logger.warning(f"Rejected file with invalid extension: {file_ext}")
-            raise ValidationError(
-                f"File type not allowed. Allowed types: {settings.ALLOWED_FILE_EXTENSIONS}",
-                details={"filename": filename, "extension": file_ext}
-            )
-
+        FileValidator._check_extension(filename)
         return True
 
     @staticmethod
@@ -99,6 +138,31 @@ class FileValidator:
 
         return True
 
+    @staticmethod
+    def _check_mime_type(file_content: bytes, filename: str, allowed_mime_types) -> str:
+        """Detect the MIME type of file_content, raising unless it is in allowed_mime_types."""
+        try:
+            # Fast path: known signatures; otherwise let python-magic inspect the header
+            for signature, known_mime in FileValidator.KNOWN_SIGNATURES:
+                if file_content.startswith(signature):
+                    mime = known_mime
+                    break
+            else:
+                mime = magic.from_buffer(file_content[:FileValidator.MIME_SNIFF_BYTES], mime=True)
+        except Exception as e:
+            logger.error(f"MIME type validation failed: {e}")
+            raise ValidationError("Unable to validate file type", details={"filename": filename})
+
+        if mime not in allowed_mime_types:
+            logger.warning(f"Rejected file with invalid MIME type: {mime} (filename: {filename})")
+            raise ValidationError(
+                f"File type not allowed (detected: {mime})",
+                details={"filename": filename, "mime_type": mime}
+            )
+
+        logger.debug(f"MIME type validated: {mime} for {filename}")
+        return mime
+
     @staticmethod
     async def validate_mime_type(file_content: bytes, filename: str) -> bool:
         """
@@ -114,37 +178,25 @@ class FileValidator:
         Raises:
             ValidationError: If MIME type not allowed
         """
-        try:
-            # Use python-magic to detect actual file type
-            mime = magic.from_buffer(file_content, mime=True)
-
-            if mime not in FileValidator.ALLOWED_MIME_TYPES:
-                logger.warning(f"Rejected file with invalid MIME type: {mime} (filename: {filename})")
-                raise ValidationError(
-                    f"File type not allowed (detected: {mime})",
-                    details={"filename": filename, "mime_type": mime}
-                )
-
-            logger.debug(f"MIME type validated: {mime} for {filename}")
-            return True
-
-        except Exception as e:
-            logger.error(f"MIME type validation failed: {e}")
-            raise ValidationError("Unable to validate file type", details={"filename": filename})
+        FileValidator._check_mime_type(file_content, filename, FileValidator.ALLOWED_MIME_TYPES)
+        return True
 
     @staticmethod
     async def validate_upload(
         file_content: bytes,
         filename: str,
-        max_size: int = None
+        max_size: int = None,
+        file_size: int = None
     ) -> Tuple[str, int]:
         """
         Complete file validation pipeline
 
         Args:
-            file_content: Binary content of file
+            file_content: Binary content of file, or just its header
+                (first MIME_SNIFF_BYTES) when file_size is given
             filename: Original filename
             max_size: Maximum allowed size (defaults to general limit)
+            file_size: Total size in bytes, if known without reading the body
 
         Returns:
             Tuple of (sanitized_filename, file_size)
@@ -158,15 +210,17 @@ class FileValidator:
         # 1. Sanitize filename
         safe_filename = FileValidator.sanitize_filename(filename)
 
-        # 2. Check extension
-        FileValidator.validate_file_extension(safe_filename)
+        # 2. Check extension (parsed once, reused for the MIME check)
+        file_ext = FileValidator._check_extension(safe_filename)
 
         # 3. Check size
-        file_size = len(file_content)
+        if file_size is None:
+            file_size = len(file_content)
         FileValidator.validate_file_size(file_size, max_size)
 
-        # 4. Check MIME type (magic numbers)
-        await FileValidator.validate_mime_type(file_content, safe_filename)
+        # 4. Check MIME type (magic numbers) matches the extension
+        allowed_mime_types = _EXT_TO_MIME.get(file_ext, FileValidator.ALLOWED_MIME_TYPES)
+        FileValidator._check_mime_type(file_content, safe_filename, allowed_mime_types)
 
         logger.info(f"File validation passed: {safe_filename} ({file_size} bytes)")
         return safe_filename, file_size
@@ -3,8 +3,11 @@ Pytest configuration and shared fixtures for QiyasAI tests.
 """
 
 import pytest
+import pytest_asyncio
 import sys
 import os
+import types
+import functools
 from pathlib import Path
 from unittest.mock import Mock, AsyncMock, patch, MagicMock
 from typing import Generator, Dict, Any
@@ -13,34 +16,127 @@ from typing import Generator, Dict, Any
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+# Stand-in for chromadb so KnowledgeBaseService never loads the real package
+# (or creates an on-disk store); must be installed before any service import
+_fake_chromadb = types.ModuleType("chromadb")
+_fake_chromadb.PersistentClient = MagicMock()
+# No stored metadata, so the embedding-dimension check has nothing to warn about
+_fake_chromadb.PersistentClient.return_value.get_or_create_collection.return_value.metadata = {}
+sys.modules["chromadb"] = _fake_chromadb
+
 # Import after path setup
+import httpx
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
 
+# Load the service modules (and the chat_history_service/kb singletons they
+# build) once, against the chromadb stub, for every test module to share
+import Backend.Source.Services.KnowledgeBaseService  # noqa: F401
+import Backend.Source.Services.ChatHistoryService  # noqa: F401
+
+
+def pytest_ignore_collect(collection_path, config):
+    """Don't import the integration tree at all for ``-m unit`` runs."""
+    if config.getoption("markexpr") == "unit" and "integration" in collection_path.parts:
+        return True
+    return None
+
+
+# ============ Security Fixtures ============
+
+@pytest.fixture(scope="session", autouse=True)
+def fast_password_hashing(worker_database):
+    """
+    Keep password hashing from dominating test setup.
+
+    Uses minimum-cost bcrypt by default. With PYTEST_FAST_AUTH set, new
+    hashes are stored as plaintext; bcrypt stays listed first so existing
+    bcrypt hashes still verify. Depends on worker_database so these hashes
+    only ever land in the session's throwaway database, never Data/qiyas.db.
+    """
+    from passlib.context import CryptContext
+
+    if os.getenv("PYTEST_FAST_AUTH"):
+        fast_context = CryptContext(
+            schemes=["bcrypt", "plaintext"],
+            default="plaintext",
+            deprecated="auto",
+            bcrypt__rounds=4
+        )
+    else:
+        fast_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4)
+    with patch("Backend.Source.Core.Security.pwd_context", fast_context):
+        yield
+
 
 # ============ Database Fixtures ============
 
-@pytest.fixture(scope="function")
-def test_db():
-    """Create a fresh in-memory SQLite database for each test."""
-    from Backend.Source.Core.Database import Base
+@pytest.fixture(scope="session", autouse=True)
+def worker_database(tmp_path_factory):
+    """
+    Point the application database at a throwaway SQLite file for the session.
 
-    engine = create_engine(
-        "sqlite:///:memory:",
+    Main creates its schema and default user on import, so without this a
+    test run would write test-only password hashes into Data/qiyas.db. Each
+    pytest-xdist worker gets its own file, so workers never contend.
+    """
+    from Backend.Source.Core import Database
+
+    worker_id = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    db_path = tmp_path_factory.getbasetemp() / f"qiyas_{worker_id}.db"
+    worker_engine = create_engine(
+        f"sqlite:///{db_path}",
         connect_args={"check_same_thread": False}
     )
-    TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # Rebind before Main is imported so its create_all/default user land here
+    original_engine = Database.engine
+    with patch.object(Database, "engine", worker_engine):
+        Database.SessionLocal.configure(bind=worker_engine)
+        try:
+            yield
+        finally:
+            # Database.engine is still the patched one until the with exits
+            Database.SessionLocal.configure(bind=original_engine)
+    worker_engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def test_engine():
+    """In-memory SQLite engine shared by the whole session; the schema is created once."""
+    from Backend.Source.Core.Database import Base
+    from Backend.Source.Models import ChatModels, User  # noqa: F401 - register tables
 
-    # Create all tables
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
     Base.metadata.create_all(bind=engine)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def test_db(test_engine):
+    """Session on the shared in-memory database, emptied after each test."""
+    from Backend.Source.Core.Database import Base
+
+    TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
 
     db = TestSessionLocal()
     try:
         yield db
     finally:
+        db.rollback()
+        # Reset rows instead of dropping and recreating the schema
+        for table in reversed(Base.metadata.sorted_tables):
+            db.execute(table.delete())
+        db.commit()
         db.close()
-        Base.metadata.drop_all(bind=engine)
 
 
 @pytest.fixture(scope="function")
@@ -101,6 +197,42 @@ def test_messages(test_db, test_conversation):
     return messages
 
 
+@pytest.fixture(scope="session")
+def db_connection(app):
+    """
+    One connection to the application database for the whole session.
+
+    Every SessionLocal() session (routes and services alike) joins this
+    connection's transaction without taking it over: their commits only
+    flush, and the outer transaction is rolled back at the end so nothing a
+    test writes is ever committed.
+    """
+    from Backend.Source.Core.Database import engine, SessionLocal
+
+    original_kw = dict(SessionLocal.kw)
+    connection = engine.connect()
+    outer_transaction = connection.begin()
+    SessionLocal.configure(bind=connection, join_transaction_mode="rollback_only")
+    try:
+        yield connection
+    finally:
+        SessionLocal.kw.clear()
+        SessionLocal.kw.update(original_kw)
+        outer_transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def db_transaction(db_connection):
+    """Wrap a test in a SAVEPOINT that is rolled back on teardown."""
+    savepoint = db_connection.begin_nested()
+    try:
+        yield db_connection
+    finally:
+        if savepoint.is_active:
+            savepoint.rollback()
+
+
 # ============ Mock Fixtures ============
 
 @pytest.fixture
@@ -140,9 +272,9 @@ def mock_azure_openai():
 @pytest.fixture
 def mock_chromadb():
     """Mock ChromaDB client."""
-    with patch("Backend.Source.Services.KnowledgeBaseService.chromadb") as mock_chroma:
+    with patch("chromadb.PersistentClient") as mock_persistent_client:
         mock_client = Mock()
-        mock_chroma.PersistentClient.return_value = mock_client
+        mock_persistent_client.return_value = mock_client
 
         # Mock collection
         mock_collection = Mock()
@@ -161,19 +293,34 @@ def mock_chromadb():
 
 # ============ API Client Fixtures ============
 
-@pytest.fixture
+@functools.lru_cache(maxsize=1)
+def _get_app():
+    """Build a FastAPI application with only the routers the shared fixtures exercise, once per process."""
+    with patch("Backend.Source.Core.Config.Validator.validate_config"):
+        from Backend.Source.Main import create_app
+    return create_app(routers=("history", "auth"))
+
+
+@pytest.fixture(scope="session")
 def app():
-    """Create FastAPI test application."""
-    from Backend.Source.Main import app
-    return app
+    """Shared FastAPI test application."""
+    return _get_app()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client(app):
-    """Create test client."""
+    """Shared test client (startup hooks are not run, so no auto-ingest)."""
     return TestClient(app)
 
 
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def async_client(app):
+    """Shared anonymous async client calling the ASGI app in-process."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
 @pytest.fixture
 def auth_headers(test_user):
     """Generate authentication headers for test user."""
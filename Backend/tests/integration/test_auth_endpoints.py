@@ -6,6 +6,8 @@ import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, Mock
 
+pytestmark = pytest.mark.integration
+
 
 class TestAuthEndpoints:
     """Integration tests for /api/auth endpoints."""
@@ -2,68 +2,132 @@
 Integration tests for Chat History API endpoints.
 """
 
+import httpx
 import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import patch
+import pytest_asyncio
+
+
+def attach_csrf_helpers(client, csrf_token):
+    """Give client auth_post/auth_delete methods that send csrf_token automatically."""
+    csrf_headers = {"X-CSRF-Token": csrf_token}
+
+    def _headers(headers):
+        return csrf_headers if headers is None else {**csrf_headers, **headers}
+
+    async def auth_post(path, headers=None, **kwargs):
+        return await client.post(path, headers=_headers(headers), **kwargs)
+
+    async def auth_delete(path, headers=None, **kwargs):
+        return await client.delete(path, headers=_headers(headers), **kwargs)
+
+    client._csrf = csrf_token
+    client.auth_post = auth_post
+    client.auth_delete = auth_delete
+
+
+# Share the session event loop with the session-scoped async clients, and
+# roll back every test's database writes
+pytestmark = [
+    pytest.mark.integration,
+    pytest.mark.asyncio(loop_scope="session"),
+    pytest.mark.usefixtures("db_transaction"),
+]
 
 
 class TestHistoryEndpoints:
     """Integration tests for /api/history endpoints."""
 
-    @pytest.fixture
-    def client(self):
-        """Create test client."""
-        with patch("Backend.Source.Core.Config.Validator.validate_config"):
-            from Backend.Source.Main import app
-            return TestClient(app)
+    @pytest_asyncio.fixture(scope="session", loop_scope="session")
+    async def auth_client(self, app):
+        """Authenticated client (cookie kept in its jar) with CSRF token, logged in once per session."""
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            login_response = await client.post(
+                "/api/auth/token",
+                data={"username": "Qiyas", "password": "1208"}
+            )
+            assert login_response.status_code == 200
+
+            csrf_token = login_response.json().get("csrf_token", "")
+            attach_csrf_helpers(client, csrf_token)
+            yield client, csrf_token
+
+    @pytest_asyncio.fixture(loop_scope="session")
+    async def fresh_client(self, app):
+        """Isolated client for tests that log in as several users."""
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+
+    @pytest.fixture(scope="module")
+    def qiyas_user(self, app):
+        """The default Qiyas user, loaded once per module."""
+        from Backend.Source.Core.Database import SessionLocal
+        from Backend.Source.Models.User import User
+
+        db = SessionLocal()
+        try:
+            return db.query(User).filter(User.username == "Qiyas").first()
+        finally:
+            db.close()
 
     @pytest.fixture
-    def auth_client(self, client):
-        """Create authenticated client with CSRF token."""
-        # Login first
-        login_response = client.post(
-            "/api/auth/token",
-            data={"username": "Qiyas", "password": "1208"}
-        )
-        assert login_response.status_code == 200
-
-        csrf_token = login_response.json().get("csrfToken", "")
-        cookies = login_response.cookies
+    def user_client(self, app, async_client, qiyas_user):
+        """
+        Shared client acting as the Qiyas user for one test, without a login.
+
+        get_current_user is overridden for this test only; CSRF is still
+        enforced, so a token is issued directly.
+        """
+        from Backend.Source.Api.Routes.Auth import get_current_user
+        from Backend.Source.Utils.CSRF import generate_csrf_token
+
+        csrf_token = generate_csrf_token()
+        attach_csrf_helpers(async_client, csrf_token)
+        app.dependency_overrides[get_current_user] = lambda: qiyas_user
+        try:
+            yield async_client, csrf_token
+        finally:
+            app.dependency_overrides.clear()
+            # The client is shared with anonymous tests
+            del async_client._csrf, async_client.auth_post, async_client.auth_delete
 
-        return client, csrf_token, cookies
+    @pytest.fixture
+    def seeded_conv(self, db_transaction, qiyas_user):
+        """IDs of conversations inserted directly for the Qiyas user, bypassing HTTP."""
+        from Backend.Source.Core.Database import SessionLocal
+        from Backend.Source.Models.ChatModels import Conversation
+
+        db = SessionLocal()
+        try:
+            conversations = [Conversation(user_id=qiyas_user.id, title=f"seed{i}") for i in range(5)]
+            db.add_all(conversations)
+            db.commit()
+            yield [conversation.id for conversation in conversations]
+        finally:
+            db.close()
 
     # ============ GET /api/history tests ============
 
-    def test_get_conversations_authenticated(self, auth_client):
+    async def test_get_conversations_authenticated(self, user_client):
         """Test getting conversation list when authenticated."""
-        client, csrf_token, cookies = auth_client
+        client, csrf_token = user_client
 
-        response = client.get(
-            "/api/history/",
-            cookies=cookies
-        )
+        response = await client.get("/api/history/")
 
         assert response.status_code == 200
         data = response.json()
         assert isinstance(data, list)
 
-    def test_get_conversations_unauthenticated(self, client):
-        """Test getting conversations without authentication."""
-        response = client.get("/api/history/")
-
-        assert response.status_code == 401
-
     # ============ POST /api/history tests ============
 
-    def test_create_conversation(self, auth_client):
+    async def test_create_conversation(self, user_client):
         """Test creating a new conversation."""
-        client, csrf_token, cookies = auth_client
+        client, csrf_token = user_client
 
-        response = client.post(
+        response = await client.auth_post(
             "/api/history/",
-            json={"title": "Test Conversation"},
-            headers={"X-CSRF-Token": csrf_token},
-            cookies=cookies
+            json={"title": "Test Conversation"}
         )
 
         assert response.status_code == 200
@@ -71,45 +135,28 @@ class TestHistoryEndpoints:
         assert "id" in data
         assert data["title"] == "Test Conversation"
 
-    def test_create_conversation_default_title(self, auth_client):
+    async def test_create_conversation_default_title(self, user_client):
         """Test creating conversation with default title."""
-        client, csrf_token, cookies = auth_client
+        client, csrf_token = user_client
 
-        response = client.post(
+        response = await client.auth_post(
             "/api/history/",
-            json={},
-            headers={"X-CSRF-Token": csrf_token},
-            cookies=cookies
+            json={}
         )
 
         assert response.status_code == 200
         data = response.json()
         assert data["title"] == "New Chat"
 
-    def test_create_conversation_without_csrf(self, auth_client):
-        """Test creating conversation without CSRF token."""
-        client, csrf_token, cookies = auth_client
-
-        response = client.post(
-            "/api/history/",
-            json={"title": "Test"},
-            cookies=cookies
-            # Missing CSRF header
-        )
-
-        assert response.status_code == 403
-
-    def test_create_conversation_title_length_limit(self, auth_client):
+    async def test_create_conversation_title_length_limit(self, user_client):
         """Test creating conversation with very long title."""
-        client, csrf_token, cookies = auth_client
+        client, csrf_token = user_client
 
         long_title = "A" * 1000  # Very long title
 
-        response = client.post(
+        response = await client.auth_post(
             "/api/history/",
-            json={"title": long_title},
-            headers={"X-CSRF-Token": csrf_token},
-            cookies=cookies
+            json={"title": long_title}
         )
 
         # Should either truncate or reject
@@ -120,24 +167,14 @@ class TestHistoryEndpoints:
 
     # ============ GET /api/history/{id} tests ============
 
-    def test_get_conversation_history(self, auth_client):
+    async def test_get_conversation_history(self, user_client, seeded_conv):
         """Test getting conversation history with pagination."""
-        client, csrf_token, cookies = auth_client
+        client, csrf_token = user_client
 
-        # First create a conversation
-        create_response = client.post(
-            "/api/history/",
-            json={"title": "Test"},
-            headers={"X-CSRF-Token": csrf_token},
-            cookies=cookies
-        )
-        conv_id = create_response.json()["id"]
+        conv_id = seeded_conv[0]
 
         # Get history
-        response = client.get(
-            f"/api/history/{conv_id}",
-            cookies=cookies
-        )
+        response = await client.get(f"/api/history/{conv_id}")
 
         assert response.status_code == 200
         data = response.json()
@@ -147,151 +184,104 @@ class TestHistoryEndpoints:
         assert "limit" in data
         assert "has_more" in data
 
-    def test_get_conversation_history_pagination(self, auth_client):
+    async def test_get_conversation_history_pagination(self, user_client, seeded_conv):
         """Test pagination parameters."""
-        client, csrf_token, cookies = auth_client
+        client, csrf_token = user_client
 
-        # Create a conversation
-        create_response = client.post(
-            "/api/history/",
-            json={"title": "Test"},
-            headers={"X-CSRF-Token": csrf_token},
-            cookies=cookies
-        )
-        conv_id = create_response.json()["id"]
+        conv_id = seeded_conv[0]
 
         # Get with pagination
-        response = client.get(
-            f"/api/history/{conv_id}?skip=0&limit=10",
-            cookies=cookies
-        )
+        response = await client.get(f"/api/history/{conv_id}?skip=0&limit=10")
 
         assert response.status_code == 200
         data = response.json()
         assert data["skip"] == 0
         assert data["limit"] == 10
 
-    def test_get_conversation_history_invalid_id(self, auth_client):
+    async def test_get_conversation_history_invalid_id(self, user_client):
         """Test getting history for non-existent conversation."""
-        client, csrf_token, cookies = auth_client
+        client, csrf_token = user_client
 
-        response = client.get(
-            "/api/history/99999",
-            cookies=cookies
-        )
+        response = await client.get("/api/history/99999")
 
         assert response.status_code == 404
 
-    def test_get_conversation_history_unauthenticated(self, client):
-        """Test getting history without authentication."""
-        response = client.get("/api/history/1")
-
-        assert response.status_code == 401
-
     # ============ DELETE /api/history/{id} tests ============
 
-    def test_delete_conversation(self, auth_client):
+    async def test_delete_conversation(self, user_client, seeded_conv):
         """Test deleting a conversation."""
-        client, csrf_token, cookies = auth_client
+        client, csrf_token = user_client
 
-        # Create a conversation first
-        create_response = client.post(
-            "/api/history/",
-            json={"title": "To Delete"},
-            headers={"X-CSRF-Token": csrf_token},
-            cookies=cookies
-        )
-        conv_id = create_response.json()["id"]
+        conv_id = seeded_conv[0]
 
         # Delete it
-        response = client.delete(
-            f"/api/history/{conv_id}",
-            headers={"X-CSRF-Token": csrf_token},
-            cookies=cookies
-        )
+        response = await client.auth_delete(f"/api/history/{conv_id}")
 
         assert response.status_code == 200
-        assert response.json()["status"] == "success"
+        data = response.json()
+        assert data["status"] == "success"
 
         # Verify it's gone
-        get_response = client.get(
-            f"/api/history/{conv_id}",
-            cookies=cookies
-        )
+        get_response = await client.get(f"/api/history/{conv_id}")
         assert get_response.status_code == 404
 
-    def test_delete_conversation_without_csrf(self, auth_client):
-        """Test deleting without CSRF token."""
-        client, csrf_token, cookies = auth_client
-
-        # Create a conversation
-        create_response = client.post(
-            "/api/history/",
-            json={"title": "Test"},
-            headers={"X-CSRF-Token": csrf_token},
-            cookies=cookies
-        )
-        conv_id = create_response.json()["id"]
-
-        # Try to delete without CSRF
-        response = client.delete(
-            f"/api/history/{conv_id}",
-            cookies=cookies
+    # ============ Authentication / CSRF matrix ============
+
+    @pytest.mark.parametrize("method,path,auth,expected", [
+        ("GET", "/api/history/", None, 401),
+        ("GET", "/api/history/{id}", None, 401),
+        ("POST", "/api/history/", "session", 403),
+        ("DELETE", "/api/history/{id}", "session", 403),
+        ("DELETE", "/api/history/99999", "csrf", 404),
+    ], ids=[
+        "list-unauthenticated",
+        "history-unauthenticated",
+        "create-without-csrf",
+        "delete-without-csrf",
+        "delete-nonexistent",
+    ])
+    async def test_auth_csrf_matrix(
+        self, async_client, auth_client, seeded_conv, method, path, auth, expected
+    ):
+        """Test rejected requests: no session (None), session without CSRF, or unknown ID."""
+        client, csrf_token = auth_client
+        if auth is None:
+            client = async_client
+        headers = {"X-CSRF-Token": csrf_token} if auth == "csrf" else {}
+        json_body = {"title": "Test"} if method == "POST" else None
+
+        response = await client.request(
+            method,
+            path.format(id=seeded_conv[0]),
+            json=json_body,
+            headers=headers
         )
 
-        assert response.status_code == 403
-
-    def test_delete_nonexistent_conversation(self, auth_client):
-        """Test deleting non-existent conversation."""
-        client, csrf_token, cookies = auth_client
-
-        response = client.delete(
-            "/api/history/99999",
-            headers={"X-CSRF-Token": csrf_token},
-            cookies=cookies
-        )
-
-        assert response.status_code == 404
+        assert response.status_code == expected
 
     # ============ Authorization tests ============
 
-    def test_cannot_access_other_users_conversation(self, client):
+    async def test_cannot_access_other_users_conversation(self, fresh_client, seeded_conv):
         """Test that users cannot access other users' conversations."""
-        # Login as first user
-        login1 = client.post(
-            "/api/auth/token",
-            data={"username": "Qiyas", "password": "1208"}
-        )
-        csrf1 = login1.json().get("csrfToken", "")
-        cookies1 = login1.cookies
+        client = fresh_client
 
-        # Create conversation as first user
-        create_response = client.post(
-            "/api/history/",
-            json={"title": "Private Chat"},
-            headers={"X-CSRF-Token": csrf1},
-            cookies=cookies1
-        )
-        conv_id = create_response.json()["id"]
+        # Conversation owned by the first user
+        conv_id = seeded_conv[0]
 
         # Try to register and login as second user
-        client.post(
+        await client.post(
             "/api/auth/register",
             json={"username": "otheruser", "password": "password123"}
         )
-        login2 = client.post(
+        login2 = await client.post(
             "/api/auth/token",
             data={"username": "otheruser", "password": "password123"}
         )
 
         if login2.status_code == 200:
-            cookies2 = login2.cookies
-
+            # The client's cookie jar now holds the second user's session
             # Try to access first user's conversation
-            response = client.get(
-                f"/api/history/{conv_id}",
-                cookies=cookies2
-            )
+            response = await client.get(f"/api/history/{conv_id}")
 
             # Should be denied (404 to hide existence)
             assert response.status_code == 404
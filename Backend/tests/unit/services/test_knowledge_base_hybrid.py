@@ -1,27 +1,23 @@
 import pytest
 from unittest.mock import MagicMock, patch
 import sys
+from collections import defaultdict
 
 # We need to make sure KnowledgeBaseService is imported after we setup some mocks if we were doing module level, 
 # but here we rely on patching classes.
 
 from Backend.Source.Services.KnowledgeBaseService import KnowledgeBaseService
 
-@pytest.fixture
+pytestmark = pytest.mark.unit
+
+@pytest.fixture(scope="module")
 def mock_embedding_fn():
     with patch('Backend.Source.Services.KnowledgeBaseService.CustomAzureEmbeddingFunction') as MockClass:
         yield MockClass
 
-@pytest.fixture
-def mock_chroma_client():
-    # Patch where the class is defined, which is the chromadb module
-    with patch('chromadb.PersistentClient') as MockClient:
-        mock_instance = MagicMock()
-        MockClient.return_value = mock_instance
-        yield mock_instance
-
-@pytest.fixture
-def kb_service(mock_chroma_client, mock_embedding_fn):
+@pytest.fixture(scope="module")
+def kb_service(mock_embedding_fn):
+    # chromadb itself is stubbed out in conftest.py
     # Mock settings
     with patch('Backend.Source.Services.KnowledgeBaseService.settings'):
         service = KnowledgeBaseService()
@@ -29,33 +25,61 @@ def kb_service(mock_chroma_client, mock_embedding_fn):
         service.collection = MagicMock()
         return service
 
-def test_rrf_merge_logic(kb_service):
-    """
-    Test RRF merging logic manually.
-    """
-    # Semantic results
-    semantic = {
-        'ids': [['A', 'B']],
-        'metadatas': [[{'id': 'A'}, {'id': 'B'}]],
-        'documents': [['Doc A', 'Doc B']],
-        'distances': [[0.1, 0.2]]
+@pytest.fixture(autouse=True)
+def _reset(kb_service):
+    # The service is shared by the module; give each test clean search mocks
+    kb_service.query = MagicMock()
+    kb_service.search_exact = MagicMock()
+    yield
+
+def make_semantic(ids):
+    """Semantic results (batch format, as returned by collection.query)."""
+    return {
+        'ids': [list(ids)],
+        'metadatas': [[{'id': doc_id} for doc_id in ids]],
+        'documents': [[f'Doc {doc_id}' for doc_id in ids]],
+        'distances': [[0.1 * (rank + 1) for rank in range(len(ids))]]
     }
-    
-    # Lexical results
-    lexical = {
-        'ids': ['B', 'C'],
-        'metadatas': [{'id': 'B'}, {'id': 'C'}],
-        'documents': ['Doc B', 'Doc C']
+
+def make_lexical(ids):
+    """Lexical results (flat format, as returned by collection.get)."""
+    return {
+        'ids': list(ids),
+        'metadatas': [{'id': doc_id} for doc_id in ids],
+        'documents': [f'Doc {doc_id}' for doc_id in ids]
     }
-    
-    result = kb_service._rrf_merge(semantic, lexical, limit=3, k=1)
+
+def expected_rrf(sem_ids, lex_ids, k):
+    """Reference RRF ordering: score = sum of 1 / (k + rank), ties keep first-seen order."""
+    scores = defaultdict(float)
+    for rank, doc_id in enumerate(sem_ids):
+        scores[doc_id] += 1 / (k + rank + 1)
+    for rank, doc_id in enumerate(lex_ids):
+        scores[doc_id] += 1 / (k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda kv: -kv[1])]
+
+def test_expected_rrf_reference():
+    """
+    Pin the reference helper to the hand-computed case.
+    """
+    # B: 0.5 + 0.33 = 0.833, A: 0.5, C: 0.33
+    assert expected_rrf(['A', 'B'], ['B', 'C'], 1) == ['B', 'A', 'C']
+
+@pytest.mark.parametrize("sem_ids,lex_ids,k", [
+    (['A', 'B'], ['B', 'C'], 1),
+    ([], ['B', 'C'], 1),
+    (['A', 'B'], [], 60),
+    (['A'], ['B'], 60),
+], ids=["both", "lexical-only", "semantic-only", "tie"])
+def test_rrf_merge_logic(kb_service, sem_ids, lex_ids, k):
+    """
+    Test RRF merging logic against the reference ordering.
+    """
+    limit = 3
+    result = kb_service._rrf_merge(make_semantic(sem_ids), make_lexical(lex_ids), limit=limit, k=k)
     
     returned_ids = result['ids'][0]
-    # B: 0.33 + 0.5 = 0.833
-    # A: 0.5
-    # C: 0.33
-    assert returned_ids == ['B', 'A', 'C']
-    assert len(returned_ids) == 3
+    assert returned_ids == expected_rrf(sem_ids, lex_ids, k)[:limit]
 
 def test_search_hybrid_integration(kb_service):
     """
@@ -3,10 +3,23 @@ Unit tests for CSRF utility.
 """
 
 import pytest
+import re
+import time
 from unittest.mock import Mock, patch
-from datetime import datetime, timedelta
 from fastapi import HTTPException
 
+from Backend.Source.Utils.CSRF import (
+    CSRF_TOKEN_EXPIRY,
+    ShardedTokenStore,
+    cleanup_expired_tokens,
+    csrf_token_key,
+    csrf_tokens,
+    generate_csrf_token,
+    verify_csrf,
+)
+
+pytestmark = pytest.mark.unit
+
 
 class TestCSRF:
     """Tests for CSRF token management."""
@@ -14,14 +27,10 @@ class TestCSRF:
     @pytest.fixture(autouse=True)
     def setup(self):
         """Clear CSRF tokens before each test."""
-        # Import here to ensure fresh state
-        from Backend.Source.Utils.CSRF import csrf_tokens
         csrf_tokens.clear()
 
     def test_generate_csrf_token(self):
         """Test CSRF token generation."""
-        from Backend.Source.Utils.CSRF import generate_csrf_token
-
         token = generate_csrf_token()
 
         assert token is not None
@@ -30,8 +39,6 @@ class TestCSRF:
 
     def test_generate_csrf_token_unique(self):
         """Test that generated tokens are unique."""
-        from Backend.Source.Utils.CSRF import generate_csrf_token
-
         tokens = [generate_csrf_token() for _ in range(100)]
         unique_tokens = set(tokens)
 
@@ -39,16 +46,13 @@ class TestCSRF:
 
     def test_generate_csrf_token_stored(self):
         """Test that generated token is stored."""
-        from Backend.Source.Utils.CSRF import generate_csrf_token, csrf_tokens
-
         token = generate_csrf_token()
 
-        assert token in csrf_tokens
+        assert csrf_token_key(token) in csrf_tokens
+        assert token not in csrf_tokens  # Raw token is never stored
 
-    def test_verify_csrf_valid_token(self):
+    async def test_verify_csrf_valid_token(self):
         """Test verification of valid CSRF token."""
-        from Backend.Source.Utils.CSRF import generate_csrf_token, verify_csrf, csrf_tokens
-
         token = generate_csrf_token()
 
         # Create mock request with valid token
@@ -56,24 +60,20 @@ class TestCSRF:
         mock_request.headers = {"X-CSRF-Token": token}
 
         # Should not raise exception
-        verify_csrf(request=mock_request)
+        await verify_csrf(request=mock_request)
 
-    def test_verify_csrf_missing_token(self):
+    async def test_verify_csrf_missing_token(self):
         """Test verification with missing CSRF token."""
-        from Backend.Source.Utils.CSRF import verify_csrf
-
         mock_request = Mock()
         mock_request.headers = {}
 
         with pytest.raises(HTTPException) as exc_info:
-            verify_csrf(request=mock_request)
+            await verify_csrf(request=mock_request)
 
         assert exc_info.value.status_code == 403
 
-    def test_verify_csrf_invalid_token(self):
+    async def test_verify_csrf_invalid_token(self):
         """Test verification with invalid CSRF token."""
-        from Backend.Source.Utils.CSRF import verify_csrf, generate_csrf_token
-
         # Generate a valid token but use a different one
         generate_csrf_token()
 
@@ -81,42 +81,34 @@ class TestCSRF:
         mock_request.headers = {"X-CSRF-Token": "invalid_token_12345"}
 
         with pytest.raises(HTTPException) as exc_info:
-            verify_csrf(request=mock_request)
+            await verify_csrf(request=mock_request)
 
         assert exc_info.value.status_code == 403
 
-    def test_verify_csrf_expired_token(self):
+    async def test_verify_csrf_expired_token(self):
         """Test verification with expired CSRF token."""
-        from Backend.Source.Utils.CSRF import verify_csrf, csrf_tokens
-
         # Manually add an expired token
         expired_token = "expired_test_token"
-        expired_time = datetime.utcnow() - timedelta(hours=2)  # 2 hours ago
-        csrf_tokens[expired_token] = expired_time
+        expired_time = time.monotonic() - 7200  # expired 2 hours ago
+        csrf_tokens[csrf_token_key(expired_token)] = expired_time
 
         mock_request = Mock()
         mock_request.headers = {"X-CSRF-Token": expired_token}
 
         with pytest.raises(HTTPException) as exc_info:
-            verify_csrf(request=mock_request)
+            await verify_csrf(request=mock_request)
 
         assert exc_info.value.status_code == 403
 
     def test_cleanup_expired_tokens(self):
         """Test cleanup of expired tokens."""
-        from Backend.Source.Utils.CSRF import (
-            generate_csrf_token,
-            cleanup_expired_tokens,
-            csrf_tokens
-        )
-
         # Generate a valid token
         valid_token = generate_csrf_token()
 
         # Manually add expired tokens
         for i in range(5):
             expired_token = f"expired_{i}"
-            csrf_tokens[expired_token] = datetime.utcnow() - timedelta(hours=2)
+            csrf_tokens[csrf_token_key(expired_token)] = time.monotonic() - 7200
 
         # Should have 6 tokens total
         assert len(csrf_tokens) == 6
@@ -126,52 +118,43 @@ class TestCSRF:
 
         # Should only have the valid token left
         assert len(csrf_tokens) == 1
-        assert valid_token in csrf_tokens
+        assert csrf_token_key(valid_token) in csrf_tokens
 
-    def test_token_consumed_after_verification(self):
+    async def test_token_consumed_after_verification(self):
         """Test that token is NOT consumed after verification (should remain valid)."""
-        from Backend.Source.Utils.CSRF import generate_csrf_token, verify_csrf, csrf_tokens
-
         token = generate_csrf_token()
 
         mock_request = Mock()
         mock_request.headers = {"X-CSRF-Token": token}
 
         # First verification
-        verify_csrf(request=mock_request)
+        await verify_csrf(request=mock_request)
 
         # Token should still be valid (not single-use)
-        assert token in csrf_tokens
+        assert csrf_token_key(token) in csrf_tokens
 
     def test_csrf_token_format(self):
         """Test that CSRF token has correct format."""
-        from Backend.Source.Utils.CSRF import generate_csrf_token
-
         token = generate_csrf_token()
 
         # Should be URL-safe base64
-        import re
         assert re.match(r'^[A-Za-z0-9_-]+$', token)
 
     def test_multiple_tokens_stored(self):
         """Test that multiple tokens can be stored (for multiple sessions)."""
-        from Backend.Source.Utils.CSRF import generate_csrf_token, csrf_tokens
-
         tokens = [generate_csrf_token() for _ in range(10)]
 
         assert len(csrf_tokens) == 10
         for token in tokens:
-            assert token in csrf_tokens
+            assert csrf_token_key(token) in csrf_tokens
 
-    def test_verify_csrf_header_case_sensitivity(self):
+    async def test_verify_csrf_header_case_sensitivity(self):
         """Test CSRF header is case-sensitive."""
-        from Backend.Source.Utils.CSRF import generate_csrf_token, verify_csrf
-
         token = generate_csrf_token()
 
         # Test with different header case
         mock_request = Mock()
-        mock_request.headers = {"x-csrf-token": token}  # lowercase
+        mock_request.headers = Mock()  # holds {"x-csrf-token": token}, lowercase
 
         # FastAPI normalizes headers, but test with exact case
         mock_request.headers.get = Mock(return_value=None)
@@ -179,17 +162,68 @@ class TestCSRF:
         # Should handle case-insensitive header access
         # This depends on implementation - just verify no crash
         try:
-            verify_csrf(request=mock_request)
+            await verify_csrf(request=mock_request)
         except HTTPException as e:
             assert e.status_code == 403  # Missing token is expected
 
     def test_token_timestamp_stored(self):
-        """Test that token timestamp is stored correctly."""
-        from Backend.Source.Utils.CSRF import generate_csrf_token, csrf_tokens
-
-        before = datetime.utcnow()
+        """Test that token expiry timestamp is stored correctly."""
+        before = time.monotonic()
         token = generate_csrf_token()
-        after = datetime.utcnow()
-
-        stored_time = csrf_tokens[token]
-        assert before <= stored_time <= after
+        after = time.monotonic()
+
+        stored_expiry = csrf_tokens[csrf_token_key(token)]
+        assert before + CSRF_TOKEN_EXPIRY <= stored_expiry <= after + CSRF_TOKEN_EXPIRY
+
+    def test_sharded_store_remove_expired(self):
+        """Test expired entries are removed across all shards."""
+        store = ShardedTokenStore(shard_count=4)
+        for i in range(64):
+            store[bytes([i]) * 16] = 0.0 if i % 2 else 100.0
+
+        assert len(store) == 64
+        assert store.remove_expired(now=50.0) == 32
+        assert len(store) == 32
+        assert all(store[key] == 100.0 for key in store)
+
+    def test_sharded_store_remove_mostly_expired(self):
+        """Test a mostly-expired shard keeps exactly its live entries."""
+        store = ShardedTokenStore(shard_count=1)
+        for i in range(10):
+            store[bytes([i]) * 16] = 100.0 if i == 3 else 0.0
+
+        assert store.remove_expired(now=50.0) == 9
+        assert list(store) == [bytes([3]) * 16]
+        assert store.remove_expired(now=50.0) == 0
+
+    def test_sharded_store_remove_expired_skips_reset_keys(self):
+        """Test a key re-set with a later expiry survives its stale heap entry."""
+        store = ShardedTokenStore(shard_count=2)
+        key = b"k" * 16
+        store[key] = 0.0
+        store[key] = 100.0
+
+        assert store.remove_expired(now=50.0) == 0
+        assert store[key] == 100.0
+
+    def test_sharded_store_max_size_evicts_oldest(self):
+        """Test a full store evicts the oldest entry instead of growing."""
+        store = ShardedTokenStore(shard_count=1, max_size=3)
+        keys = [bytes([i]) * 16 for i in range(4)]
+        for expiry, key in enumerate(keys):
+            store[key] = float(expiry)
+
+        assert len(store) == 3
+        assert keys[0] not in store
+        assert all(key in store for key in keys[1:])
+
+    def test_sharded_store_max_size_bounds_expiry_heap(self):
+        """Test evicted keys don't leave the expiry heap growing past the cap."""
+        store = ShardedTokenStore(shard_count=1, max_size=3)
+        for i in range(1000):
+            store[i.to_bytes(16, "big")] = float(i)
+
+        assert len(store) == 3
+        _, heap, _ = store._shards[0]
+        assert len(heap) <= 2 * 3 + ShardedTokenStore._HEAP_SLACK
+        assert store.remove_expired(now=1000.0) == 3
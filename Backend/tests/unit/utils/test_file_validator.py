@@ -7,6 +7,8 @@ from unittest.mock import patch, Mock
 from Backend.Source.Utils.FileValidator import FileValidator
 from Backend.Source.Core.Exceptions import ValidationError
 
+pytestmark = pytest.mark.unit
+
 
 class TestFileValidator:
     """Tests for FileValidator class."""
@@ -30,6 +32,22 @@ class TestFileValidator:
         assert ".." not in result
         assert "\\" not in result
 
+    def test_sanitize_filename_split_traversal(self):
+        """Test dots separated by stripped characters don't rejoin into '..'."""
+        result = FileValidator.sanitize_filename("report./.\x00.pdf")
+        assert ".." not in result
+
+    def test_sanitize_filename_dot_run_keeps_extension(self):
+        """Test a run of dots collapses to one instead of dropping the extension."""
+        result = FileValidator.sanitize_filename("a...pdf")
+        assert result == "a.pdf"
+
+    @pytest.mark.parametrize("filename", ["..", "x/..", "..\\.."])
+    def test_sanitize_filename_only_dots_raises(self, filename):
+        """Test names that reduce to dots alone are rejected."""
+        with pytest.raises(ValidationError):
+            FileValidator.sanitize_filename(filename)
+
     def test_sanitize_filename_null_bytes(self):
         """Test removal of null bytes."""
         result = FileValidator.sanitize_filename("document\x00.pdf")
@@ -182,6 +200,27 @@ class TestFileValidator:
             result = await FileValidator.validate_mime_type(content, "photo.jpg")
             assert result is True
 
+    @pytest.mark.asyncio
+    async def test_validate_mime_type_known_signature_skips_magic(self):
+        """Test known magic-byte prefixes are resolved without libmagic."""
+        with patch("Backend.Source.Utils.FileValidator.magic") as mock_magic:
+            result = await FileValidator.validate_mime_type(b"%PDF-1.7 body", "document.pdf")
+
+            assert result is True
+            mock_magic.from_buffer.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_validate_mime_type_sniffs_header_only(self):
+        """Test only the file header is passed to libmagic."""
+        with patch("Backend.Source.Utils.FileValidator.magic") as mock_magic:
+            mock_magic.from_buffer.return_value = "text/plain"
+
+            content = b"a" * (FileValidator.MIME_SNIFF_BYTES * 4)
+            await FileValidator.validate_mime_type(content, "notes.txt")
+
+            sniffed = mock_magic.from_buffer.call_args[0][0]
+            assert len(sniffed) == FileValidator.MIME_SNIFF_BYTES
+
     # ============ validate_upload integration tests ============
 
     @pytest.mark.asyncio
@@ -244,6 +283,19 @@ class TestFileValidator:
                     max_size=1000000
                 )
 
+    @pytest.mark.asyncio
+    async def test_validate_upload_content_extension_mismatch(self):
+        """Test upload validation rejects allowed content under another allowed extension."""
+        content = b"\x89PNG\r\n\x1a\n image data"
+        filename = "image_renamed.pdf"
+
+        with pytest.raises(ValidationError):
+            await FileValidator.validate_upload(
+                content,
+                filename,
+                max_size=1000000
+            )
+
     @pytest.mark.asyncio
     async def test_validate_upload_path_traversal_sanitized(self):
         """Test that path traversal is sanitized in upload."""
@@ -261,3 +313,27 @@ class TestFileValidator:
 
             assert ".." not in safe_name
             assert "/" not in safe_name
+
+    @pytest.mark.asyncio
+    async def test_validate_upload_header_with_declared_size(self):
+        """Test upload validation from a header plus the declared total size."""
+        with patch("Backend.Source.Utils.FileValidator.magic") as mock_magic:
+            header = b"%PDF-1.4 header"
+
+            safe_name, size = await FileValidator.validate_upload(
+                header,
+                "document.pdf",
+                max_size=1000000,
+                file_size=500000
+            )
+
+            assert safe_name == "document.pdf"
+            assert size == 500000
+
+            with pytest.raises(ValidationError):
+                await FileValidator.validate_upload(
+                    header,
+                    "document.pdf",
+                    max_size=1000000,
+                    file_size=1000001
+                )
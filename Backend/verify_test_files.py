@@ -1,5 +1,5 @@
 import asyncio
-import os
+import io
 import sys
 from pathlib import Path
 import logging
@@ -23,51 +23,69 @@ async def mock_extract_text_from_path(file_path: Path):
             self.content_type = "application/pdf" if path.suffix.lower() == ".pdf" else "application/octet-stream"
         
         async def read(self):
-            with open(self.path, "rb") as f: 
-                return f.read()
+            # Read off the event loop so concurrent files can overlap I/O with inference
+            return await asyncio.to_thread(self.path.read_bytes)
     
     local_file = LocalFile(file_path)
     return await DocumentService.extract_text(local_file)
 
-async def test_files(output_file):
-    test_dir = Path(r"C:\Users\hp\Desktop\Hekata\QiyasAI\Data\Test")
-    if not test_dir.exists():
-        output_file.write(f"Directory not found: {test_dir}\n")
-        return
+# Maximum number of files extracted and analyzed at the same time
+MAX_CONCURRENT_FILES = 4
 
-    files = list(test_dir.glob("*.[pP][dD][fF]"))
-    output_file.write(f"Found {len(files)} PDF files in {test_dir}\n")
-
-    for file_path in files:
-        output_file.write(f"\n--------------------------------------------------\n")
-        output_file.write(f"Processing: {file_path.name}\n")
-        output_file.write(f"--------------------------------------------------\n")
+async def process_file(file_path: Path, semaphore: asyncio.Semaphore) -> str:
+    """Extract and classify one file, returning its report block."""
+    buf = io.StringIO()
+    buf.write(f"\n--------------------------------------------------\n")
+    buf.write(f"Processing: {file_path.name}\n")
+    buf.write(f"--------------------------------------------------\n")
+    async with semaphore:
         try:
-            output_file.write("Extacting text... ")
+            buf.write("Extacting text... ")
             text = await mock_extract_text_from_path(file_path)
-            output_file.write(f"Done. Extracted {len(text)} characters.\n")
+            buf.write(f"Done. Extracted {len(text)} characters.\n")
             
             if not text.strip():
-                output_file.write("WARNING: Extracted text is empty!\n")
-                continue
+                buf.write("WARNING: Extracted text is empty!\n")
+                return buf.getvalue()
 
-            output_file.write("Analyzing for standard... ")
+            buf.write("Analyzing for standard... ")
             result = await ai_service.analyze_document_for_standard(text, file_path.name)
-            output_file.write("Done.\n")
+            buf.write("Done.\n")
             
-            output_file.write(f"\n>>> RESULT <<<\n")
-            output_file.write(f"Standard ID: {result.get('standard_id')}\n")
-            output_file.write(f"Confidence: {result.get('confidence')}\n")
-            output_file.write(f"Tier:       {result.get('tier')}\n")
-            output_file.write(f"Reasoning:  {result.get('reasoning')}\n")
-            output_file.flush()
+            buf.write(f"\n>>> RESULT <<<\n")
+            buf.write(f"Standard ID: {result.get('standard_id')}\n")
+            buf.write(f"Confidence: {result.get('confidence')}\n")
+            buf.write(f"Tier:       {result.get('tier')}\n")
+            buf.write(f"Reasoning:  {result.get('reasoning')}\n")
         except Exception as e:
-            output_file.write(f"\nERROR: {e}\n")
+            buf.write(f"\nERROR: {e}\n")
             import traceback
-            traceback.print_exc(file=output_file)
+            traceback.print_exc(file=buf)
+    return buf.getvalue()
+
+async def test_files(output_file):
+    test_dir = Path(r"C:\Users\hp\Desktop\Hekata\QiyasAI\Data\Test")
+    if not test_dir.exists():
+        output_file.write(f"Directory not found: {test_dir}\n")
+        return
+
+    files = [p for p in test_dir.iterdir() if p.is_file() and p.suffix.lower() == ".pdf"]
+    output_file.write(f"Found {len(files)} PDF files in {test_dir}\n")
+
+    # Files are processed concurrently; reports are written in directory order
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+    reports = await asyncio.gather(*(process_file(file_path, semaphore) for file_path in files))
+    for report in reports:
+        output_file.write(report)
+        output_file.flush()
+
+async def run(output_file):
+    # One pooled AI client session for every file in the run
+    async with ai_service.session():
+        await test_files(output_file)
 
 if __name__ == "__main__":
     with open("verification_report.txt", "w", encoding="utf-8") as f:
         # Redirect stdout to this file for the duration of the script if needed, 
         # but let's just pass the file handle
-        asyncio.run(test_files(f))
+        asyncio.run(run(f))
@@ -1,4 +1,3 @@
-import os
 import sys
 import asyncio
 from pathlib import Path
@@ -9,6 +8,9 @@ sys.path.append(str(project_root))
 
 from Backend.Source.Services.IngestionService import ingestion_service
 
+# Maximum number of files ingested at the same time
+MAX_CONCURRENT_INGESTS = 8
+
 async def main():
     raw_data_path = project_root / "Data" / "Raw"
     
@@ -24,25 +26,32 @@ async def main():
 
     print(f"Found {len(files)} files. Starting ingestion with SAMRT CHUNKERS...")
 
-    for file_path in files:
-        if file_path.name.startswith("~"): # Ignore temp files
-            continue
-            
-        # Sanitize filename for printing
+    # Ingestion is dominated by I/O and embedding calls, so run several files at once
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_INGESTS)
+
+    async def ingest(file_path):
+        async with semaphore:
+            # Sanitize filename for printing
+            safe_name = file_path.name.encode('ascii', 'replace').decode('ascii')
+            print(f"Processing {safe_name}...")
+            return await ingestion_service.ingest_file(file_path)
+
+    files = [f for f in files if not f.name.startswith("~")] # Ignore temp files
+    results = await asyncio.gather(*(ingest(f) for f in files), return_exceptions=True)
+
+    for file_path, result in zip(files, results):
         safe_name = file_path.name.encode('ascii', 'replace').decode('ascii')
-        print(f"Processing {safe_name}...")
-        
-        try:
-            success, msg = await ingestion_service.ingest_file(file_path)
-            if success:
-                print(f"SUCCESS: {msg}")
-            else:
-                print(f"FAILED: {msg}")
-            
-        except Exception as e:
+        if isinstance(result, BaseException):
             import traceback
-            traceback.print_exc()
-            print(f"Failed to ingest: {e}")
+            traceback.print_exception(type(result), result, result.__traceback__)
+            print(f"Failed to ingest {safe_name}: {result}")
+            continue
+
+        success, msg = result
+        if success:
+            print(f"SUCCESS: {safe_name}: {msg}")
+        else:
+            print(f"FAILED: {safe_name}: {msg}")
 
     print("\nIngestion Complete!")
 
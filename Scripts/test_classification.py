@@ -3,6 +3,8 @@ Test script for document classification logic.
 Run from project root: python -m Scripts.test_classification
 """
 import asyncio
+import io
+import json
 import sys
 import os
 
@@ -17,6 +19,31 @@ import fitz  # PyMuPDF
 
 TEST_DIR = Path("C:/Users/hp/Desktop/Hekata/QiyasAI/Data/Test")
 
+# Extracted text is cached between runs as {path: {"mtime_ns", "size", "text"}};
+# an entry is reused only while the file's mtime and size are unchanged
+TEXT_CACHE_FILE = Path(__file__).resolve().parent / ".pdf_text_cache.json"
+
+def load_text_cache() -> dict:
+    """Load the extracted-text cache, starting empty if missing or unreadable."""
+    try:
+        cache = json.loads(TEXT_CACHE_FILE.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def save_text_cache():
+    """Write the extracted-text cache, dropping entries for files that no longer exist."""
+    live = {path: entry for path, entry in _text_cache.items() if Path(path).is_file()}
+    try:
+        TEXT_CACHE_FILE.write_text(json.dumps(live, ensure_ascii=False), encoding="utf-8")
+    except OSError as e:
+        print(f"WARNING: could not write text cache: {e}")
+
+_text_cache = load_text_cache()
+
+# Maximum number of files classified at the same time
+MAX_CONCURRENT_TESTS = 5
+
 # Expected results for validation
 EXPECTED_STANDARDS = {
     "الأدوار والمسؤوليات لنظام استمرارية الاعمال.pdf": "5.9",  # Business Continuity
@@ -24,56 +51,73 @@ EXPECTED_STANDARDS = {
 }
 
 def extract_pdf_text(filepath: Path) -> str:
-    """Extract text from PDF using PyMuPDF."""
-    doc = fitz.open(filepath)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
+    """Extract text from PDF using PyMuPDF, reusing the cached text for unchanged files."""
+    stat = filepath.stat()
+    entry = _text_cache.get(str(filepath))
+    if (isinstance(entry, dict) and entry.get("mtime_ns") == stat.st_mtime_ns
+            and entry.get("size") == stat.st_size):
+        return entry["text"]
+
+    with fitz.open(filepath) as doc:
+        text = "".join(page.get_text() for page in doc)
+
+    _text_cache[str(filepath)] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "text": text}
     return text
 
 async def test_file(filepath: Path):
-    """Test classification for a single file."""
-    print(f"\n{'='*60}")
-    print(f"Testing: {filepath.name}")
-    print(f"{'='*60}")
+    """
+    Test classification for a single file.
+
+    Returns (result, report): the classification result (None on error)
+    and the text this test printed, buffered so concurrent tests don't
+    interleave their output.
+    """
+    out = io.StringIO()
+    print(f"\n{'='*60}", file=out)
+    print(f"Testing: {filepath.name}", file=out)
+    print(f"{'='*60}", file=out)
 
     # Extract text from file
     try:
         doc_text = extract_pdf_text(filepath)
-        print(f"Extracted {len(doc_text)} characters")
-        print(f"Preview: {doc_text[:300]}...")
+        print(f"Extracted {len(doc_text)} characters", file=out)
+        print(f"Preview: {doc_text[:300]}...", file=out)
 
     except Exception as e:
-        print(f"ERROR extracting text: {e}")
-        return None
+        print(f"ERROR extracting text: {e}", file=out)
+        return None, out.getvalue()
 
     # Test classification
     try:
         result = await ai_service.analyze_document_for_standard(doc_text, filepath.name)
 
-        print(f"\n--- Classification Result ---")
-        print(f"Standard ID: {result.get('standard_id')}")
-        print(f"Confidence:  {result.get('confidence')}")
-        print(f"Tier:        {result.get('tier')}")
-        print(f"Reasoning:   {result.get('reasoning')}")
+        print(f"\n--- Classification Result ---", file=out)
+        print(f"Standard ID: {result.get('standard_id')}", file=out)
+        print(f"Confidence:  {result.get('confidence')}", file=out)
+        print(f"Tier:        {result.get('tier')}", file=out)
+        print(f"Reasoning:   {result.get('reasoning')}", file=out)
 
         # Check against expected
         expected = EXPECTED_STANDARDS.get(filepath.name)
         if expected:
             detected = result.get('standard_id', '')
             if detected and detected.startswith(expected):
-                print(f"\n✅ PASS: Expected {expected}, got {detected}")
+                print(f"\n✅ PASS: Expected {expected}, got {detected}", file=out)
             else:
-                print(f"\n❌ FAIL: Expected {expected}, got {detected}")
+                print(f"\n❌ FAIL: Expected {expected}, got {detected}", file=out)
 
-        return result
+        return result, out.getvalue()
 
     except Exception as e:
-        print(f"ERROR classifying: {e}")
+        print(f"ERROR classifying: {e}", file=out)
         import traceback
-        traceback.print_exc()
-        return None
+        traceback.print_exc(file=out)
+        return None, out.getvalue()
+
+async def iter_as_completed(coros):
+    """Yield the results of coros in completion order."""
+    for next_done in asyncio.as_completed(list(coros)):
+        yield await next_done
 
 async def main():
     print("="*60)
@@ -81,7 +125,11 @@ async def main():
     print("="*60)
 
     # Get all PDF files in test directory
-    test_files = list(TEST_DIR.glob("*.pdf"))
+    # Suffix check instead of a glob so .PDF/.Pdf files are picked up too;
+    # unlike glob, iterdir raises on a missing directory
+    test_files = []
+    if TEST_DIR.is_dir():
+        test_files = [p for p in TEST_DIR.iterdir() if p.is_file() and p.suffix.lower() == ".pdf"]
 
     if not test_files:
         print(f"No PDF files found in {TEST_DIR}")
@@ -89,10 +137,21 @@ async def main():
 
     print(f"Found {len(test_files)} test files")
 
-    results = []
-    for filepath in test_files:
-        result = await test_file(filepath)
-        results.append((filepath.name, result))
+    # Classify several files at once; each report is printed as soon as its
+    # file finishes, and the summary below keeps directory order
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TESTS)
+
+    async def bounded_test(filepath):
+        async with semaphore:
+            result, report = await test_file(filepath)
+            return filepath.name, result, report
+
+    results_by_name = {}
+    async for filename, result, report in iter_as_completed(bounded_test(fp) for fp in test_files):
+        print(report, end="")
+        results_by_name[filename] = result
+
+    results = [(filepath.name, results_by_name[filepath.name]) for filepath in test_files]
 
     # Summary
     print(f"\n{'='*60}")
@@ -108,5 +167,14 @@ async def main():
         else:
             print(f"{filename[:40]:40} -> ERROR")
 
+async def run():
+    # One pooled AI client session for every file in the run
+    try:
+        async with ai_service.session():
+            await main()
+    finally:
+        # Written once per run rather than after every extracted file
+        save_text_cache()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run())